@@ -40,6 +40,8 @@ from constants import inverter_name_dict, module_name_dict
 from parametrization import ConfiguratorParametrization
 from pv_calculations import calculate_energy_generation, get_location_data
 
+PROVISIONAL_NOTE = "provisional estimate, update the view for the result based on the weather data of this location"
+
 
 class Controller(ViktorController):
     """Controller class which acts as interface for the Configurator entity type.
@@ -68,8 +70,11 @@ class Controller(ViktorController):
     def get_weather_data(self, params, **kwargs):
         """Visualizes the solar irradiance based on historical weather data."""
         location = params.step_1.point
+        progress_message("Retrieve weather data...")
+        # only the raw weather data is used, so no solar position is computed for this view
         location_data = get_location_data(location.lat, location.lon)
-        weather = location_data["weather"]
+        weather = location_data.weather
+        progress_message("Plot weather data...")
         x_dat = weather.index.strftime("%m-%d %H:%M").sort_values().tolist()
         temp_dat = weather["temp_air"].tolist()
         pressure_dat = weather["pressure"].tolist()
@@ -124,7 +129,9 @@ class Controller(ViktorController):
                 },
             ],
             "layout": {
-                "title": {"text": "Weather data"},
+                "title": {
+                    "text": f"Weather data ({PROVISIONAL_NOTE})" if location_data.provisional else "Weather data"
+                },
                 "xaxis": {"title": {"text": "Simulated year"}},
                 "yaxis": {"title": {"text": ""}},
                 "updatemenus": [
@@ -174,11 +181,12 @@ class Controller(ViktorController):
     def get_data_view(self, params: Munch, **kwargs):
         """Creates dataview for step 2 from the pv_calculation"""
 
-        energy_yield_per_module, nr_modules, yield_df = self.get_energy_generation(
+        energy_yield_per_module, nr_modules, yield_df, provisional = self.get_energy_generation(
             location=params.step_1.point,
             inverter=params.step_2.inverter_name,
             solar_module=params.step_2.module_name,
             solar_surface_area=params.step_1.surface,
+            fast_preview=params.step_2.fast_preview,
         )
 
         energy_info = DataItem(
@@ -215,7 +223,10 @@ class Controller(ViktorController):
             number_of_decimals=2,
         )
 
-        data = DataGroup(energy_info, number_of_modules, inverter_cost, module_cost, total_cost)
+        data_items = [energy_info, number_of_modules, inverter_cost, module_cost, total_cost]
+        if provisional:
+            data_items.insert(0, DataItem(label="Result", value=PROVISIONAL_NOTE))
+        data = DataGroup(*data_items)
 
         # prepare data for plotly
         yield_df = yield_df.groupby(pd.Grouper(key="dat", freq="1D")).sum()
@@ -228,7 +239,11 @@ class Controller(ViktorController):
                 {"type": "bar", "x": x_dat, "y": y_dat, "name": "Energy yield"},
             ],
             "layout": {
-                "title": {"text": "Electricity production simulated."},
+                "title": {
+                    "text": f"Electricity production simulated ({PROVISIONAL_NOTE})."
+                    if provisional
+                    else "Electricity production simulated."
+                },
                 "xaxis": {"title": {"text": "Simulated year"}},
                 "yaxis": {"title": {"text": "Yield [kWh/day]"}},
             },
@@ -240,11 +255,12 @@ class Controller(ViktorController):
     def get_plotly_view(self, params: Munch, **kwargs):
         """Shows the plot of the energy yield with break-even point"""
         progress_message("Calculate energy generation...")
-        _, nr_modules, yield_df = self.get_energy_generation(
+        _, nr_modules, yield_df, provisional = self.get_energy_generation(
             location=params.step_1.point,
             inverter=params.step_2.inverter_name,
             solar_module=params.step_2.module_name,
             solar_surface_area=params.step_1.surface,
+            fast_preview=params.step_2.fast_preview,
         )
 
         progress_message("Extract yield data...")
@@ -301,6 +317,7 @@ class Controller(ViktorController):
             }
 
         progress_message("Plot results...")
+        title_note = f" ({PROVISIONAL_NOTE})" if provisional else ""
         if params.step_3.break_even_toggle:
             fig = {
                 "data": [
@@ -318,7 +335,7 @@ class Controller(ViktorController):
                     },
                 ],
                 "layout": {
-                    "title": {"text": f"Energy generation over time (break-even = {time_period} years)"},
+                    "title": {"text": f"Energy generation over time (break-even = {time_period} years){title_note}"},
                     "xaxis": {"title": {"text": "Forecast horizon"}},
                     "yaxis": {"title": {"text": "Revenue produced by system [€]"}},
                 },
@@ -336,7 +353,7 @@ class Controller(ViktorController):
                     }
                 ],
                 "layout": {
-                    "title": {"text": "Energy generation over time"},
+                    "title": {"text": f"Energy generation over time{title_note}"},
                     "xaxis": {"title": {"text": "Forecast horizon"}},
                     "yaxis": {"title": {"text": "Revenue produced by system [€]"}},
                 },
@@ -345,15 +362,20 @@ class Controller(ViktorController):
         return PlotlyResult(fig)
 
     @staticmethod
-    def get_energy_generation(location: GeoPoint, inverter: str, solar_module: str, solar_surface_area: float):
-        """Generate energy yield data"""
-        return calculate_energy_generation(
+    def get_energy_generation(
+        location: GeoPoint, inverter: str, solar_module: str, solar_surface_area: float, fast_preview: bool = False
+    ):
+        """Generate energy yield data, and whether it is a provisional estimate (clear-sky or from a nearby location)"""
+        location_data = get_location_data(location.lat, location.lon, fast_preview=fast_preview)
+        energy_yield_per_module, nr_modules, yield_df = calculate_energy_generation(
             latitude=location.lat,
             longitude=location.lon,
             inverter_name=inverter_name_dict[inverter]["name"],
             module_name=module_name_dict[solar_module]["name"],
             area=solar_surface_area,
+            location_data=location_data,
         )
+        return energy_yield_per_module, nr_modules, yield_df, location_data.provisional
 
     @staticmethod
     def replace_year(frame, increment):
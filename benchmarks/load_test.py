@@ -0,0 +1,175 @@
+"""Load-testing harness for the views of the configurator.
+
+Drives the view methods of the Controller with randomized parameters from concurrent sessions, while PVGIS is
+replaced by a local stand-in server (see benchmarks/pvgis_stub.py) replaying the recorded TMY responses. Reports
+throughput, latency percentiles and peak memory per view, e.g.:
+    python -m benchmarks.load_test --sessions 8 --calls 40 --latency 0.3 --error-rate 0.02 --output report.json
+"""
+import argparse
+import functools
+import json
+import random
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from munch import Munch
+from viktor.geometry import GeoPoint
+
+import pv_calculations
+from app import Controller
+from benchmarks.pvgis_stub import RECORDINGS_DIR, PVGISStub
+from constants import inverter_name_dict, module_name_dict
+from weather_client import PVGISClient
+
+VIEWS = ("get_weather_data", "get_data_view", "get_plotly_view")
+
+
+def random_params(rng, recordings, location_spread=0.5, fast_preview=False):
+    """Generates a random, but realistic, set of parameters around one of the recorded locations"""
+    latitude, longitude, _ = rng.choice(recordings)
+    inverter_names = list(inverter_name_dict.keys())
+    inverter_name = rng.choice(inverter_names)
+    return Munch(
+        {
+            "step_1": Munch(
+                point=GeoPoint(
+                    latitude + rng.uniform(-location_spread, location_spread),
+                    longitude + rng.uniform(-location_spread, location_spread),
+                ),
+                surface=round(rng.uniform(10, 200), 1),
+            ),
+            "step_2": Munch(
+                # same split of the inverters over the system types as in the parametrization
+                system_type="California Energy Commission"
+                if inverter_names.index(inverter_name) >= 3
+                else "Sandia National Laboratories",
+                inverter_name=inverter_name,
+                module_name=rng.choice(list(module_name_dict.keys())),
+                fast_preview=fast_preview,
+            ),
+            "step_3": Munch(
+                forecast_horizon=rng.randint(1, 25),
+                kwh_cost=round(rng.uniform(0.1, 0.8), 2),
+                break_even_toggle=rng.random() < 0.5,
+            ),
+        }
+    )
+
+
+def get_view(controller, view_name):
+    """Returns the view method bound to the controller, the VIKTOR view decorators do not bind it themselves"""
+    return functools.partial(getattr(type(controller), view_name), controller)
+
+
+def _timed_call(view, params):
+    """Calls a view and returns the duration [s] and the exception raised (if any)"""
+    start = time.perf_counter()
+    try:
+        view(params=params)
+    except Exception as exc:  # pylint: disable=broad-except
+        return time.perf_counter() - start, exc
+    return time.perf_counter() - start, None
+
+
+def run_view(controller, view_name, params_stream, sessions):
+    """Calls a view once for every set of parameters using a pool of concurrent sessions"""
+    view = get_view(controller, view_name)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        results = list(executor.map(lambda params: _timed_call(view, params), params_stream))
+    wall_time = time.perf_counter() - start
+
+    latencies = np.array([duration for duration, exc in results if exc is None])
+    errors = [f"{type(exc).__name__}: {exc}" for _, exc in results if exc is not None]
+    percentiles = np.percentile(latencies, [50, 95, 99]) if latencies.size else [np.nan] * 3
+    return {
+        "calls": len(results),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "throughput": latencies.size / wall_time,
+        "p50": float(percentiles[0]),
+        "p95": float(percentiles[1]),
+        "p99": float(percentiles[2]),
+    }
+
+
+def measure_peak_memory(controller, view_name, params_stream):
+    """Determines the peak memory allocated by a single view call [MiB], calls are run sequentially to isolate them"""
+    view = get_view(controller, view_name)
+    peaks = []
+    for params in params_stream:
+        tracemalloc.start()
+        _, exc = _timed_call(view, params)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if exc is None:
+            peaks.append(peak / 2**20)
+    return max(peaks) if peaks else float("nan")
+
+
+def print_report(report):
+    """Prints the report as a table"""
+    header = f"{'view':<18}{'calls':>7}{'errors':>8}{'calls/s':>9}{'p50 [s]':>9}{'p95 [s]':>9}{'p99 [s]':>9}{'MiB':>8}"
+    print(header)
+    print("-" * len(header))
+    for view_name, result in report["views"].items():
+        print(
+            f"{view_name:<18}{result['calls']:>7}{result['errors']:>8}{result['throughput']:>9.2f}"
+            f"{result['p50']:>9.3f}{result['p95']:>9.3f}{result['p99']:>9.3f}{result['peak_memory']:>8.1f}"
+        )
+        for error in result["error_samples"]:
+            print(f"    {error}")
+
+
+def main():
+    """Command line interface of the load test"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--views", nargs="+", choices=VIEWS, default=list(VIEWS))
+    parser.add_argument("--sessions", type=int, default=4, help="number of concurrent sessions")
+    parser.add_argument("--calls", type=int, default=20, help="number of calls per view")
+    parser.add_argument("--memory-calls", type=int, default=3, help="number of calls per view to measure memory")
+    parser.add_argument("--recordings", type=Path, default=RECORDINGS_DIR)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean latency of the PVGIS stand-in [s]")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency spread of the PVGIS stand-in [s]")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of failing PVGIS requests [-]")
+    parser.add_argument("--timeout", type=float, default=10.0, help="read timeout of the PVGIS client [s]")
+    parser.add_argument("--retries", type=int, default=2, help="number of retries of the PVGIS client")
+    parser.add_argument("--deadline", type=float, default=30.0, help="deadline of all PVGIS attempts [s]")
+    parser.add_argument("--fast-preview", action="store_true", help="enable the fast preview in all sessions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None, help="write the report as json to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    controller = Controller()
+    report = {"settings": {key: str(value) for key, value in vars(args).items()}, "views": {}}
+    with PVGISStub(args.recordings, args.latency, args.jitter, args.error_rate, seed=args.seed) as stub:
+        # fresh client per run, so no data is cached from previous runs
+        pv_calculations.pvgis_client = PVGISClient(
+            url=stub.url,
+            timeout=(3.05, args.timeout),
+            max_retries=args.retries,
+            deadline=args.deadline,
+            pool_size=args.sessions,
+        )
+        for view_name in args.views:
+            params_stream = [
+                random_params(rng, stub.recordings, fast_preview=args.fast_preview) for _ in range(args.calls)
+            ]
+            result = run_view(controller, view_name, params_stream, args.sessions)
+            memory_stream = [
+                random_params(rng, stub.recordings, fast_preview=args.fast_preview) for _ in range(args.memory_calls)
+            ]
+            result["peak_memory"] = measure_peak_memory(controller, view_name, memory_stream)
+            report["views"][view_name] = result
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Local stand-in for the PVGIS API which replays recorded TMY responses.
+
+Record a response once (requires internet access):
+    python -m benchmarks.pvgis_stub record --lat 51.92 --lon 4.47
+
+Serve the recordings with 300 ms latency and 5% failing requests:
+    python -m benchmarks.pvgis_stub serve --port 8080 --latency 0.3 --error-rate 0.05
+and point the app to it with the environment variable PVGIS_URL=http://127.0.0.1:8080/
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pvlib
+import requests
+
+RECORDINGS_DIR = Path(__file__).parent / "recordings"
+
+
+def record_tmy(latitude, longitude, directory=RECORDINGS_DIR, url=pvlib.iotools.pvgis.URL):
+    """Fetches a TMY response from PVGIS and stores it as a recording"""
+    res = requests.get(url + "tmy", params={"lat": latitude, "lon": longitude, "outputformat": "json"}, timeout=30)
+    res.raise_for_status()
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{latitude}_{longitude}.json"
+    path.write_text(res.text, encoding="utf-8")
+    return path
+
+
+def load_recordings(directory=RECORDINGS_DIR):
+    """Loads all recorded TMY responses as a list of (latitude, longitude, body) tuples"""
+    recordings = []
+    for path in sorted(Path(directory).glob("*.json")):
+        body = path.read_bytes()
+        location = json.loads(body)["inputs"]["location"]
+        recordings.append((location["latitude"], location["longitude"], body))
+    if not recordings:
+        raise FileNotFoundError(f"No recorded PVGIS responses found in {directory}, use 'record' first.")
+    return recordings
+
+
+class _StubRequestHandler(BaseHTTPRequestHandler):
+    """Answers the PVGIS TMY endpoint with the recording nearest to the requested location"""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handles a GET request"""
+        stub = self.server.stub
+        url = urlparse(self.path)
+        if url.path.rstrip("/").split("/")[-1] != "tmy":
+            self._respond(404, b'{"message": "Unknown endpoint"}')
+            return
+        query = parse_qs(url.query)
+        try:
+            latitude, longitude = float(query["lat"][0]), float(query["lon"][0])
+        except (KeyError, ValueError):
+            self._respond(400, b'{"message": "Missing or invalid lat/lon"}')
+            return
+
+        stub.count_request()
+        time.sleep(stub.sample_latency())
+        if stub.sample_error():
+            if stub.error_status < 500 and stub.error_status != 429:
+                # PVGIS explains bad requests in a json message, e.g. for a location at sea
+                self._respond(stub.error_status, b'{"message": "Location over the sea"}')
+            else:
+                self._respond(stub.error_status, b"Service Unavailable", content_type="text/plain")
+            return
+        if stub.sample_corrupt():
+            self._respond(200, b'{"garbage": 1}')
+            return
+        self._respond(200, stub.nearest_recording(latitude, longitude))
+
+    def _respond(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Silences the default request logging"""
+
+
+class PVGISStub:
+    """Threaded HTTP server which serves recorded PVGIS TMY responses with configurable latency and error rate.
+
+    The latency of every request is drawn uniformly from `latency` +/- `jitter` seconds, after which the request
+    fails with HTTP status `error_status` with probability `error_rate`, or returns an invalid body with probability
+    `corrupt_rate`. The number of received requests is kept in `request_count`. Can be used as context manager.
+    """
+
+    def __init__(
+        self,
+        recordings_dir=RECORDINGS_DIR,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        host="127.0.0.1",
+        port=0,
+        seed=None,
+        error_status=503,
+        corrupt_rate=0.0,
+    ):
+        self.recordings = load_recordings(recordings_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.corrupt_rate = corrupt_rate
+        self.request_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _StubRequestHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base url to be used instead of the PVGIS API url"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def sample_latency(self):
+        """Draws the latency of a single request"""
+        with self._lock:
+            return max(0.0, self._random.uniform(self.latency - self.jitter, self.latency + self.jitter))
+
+    def sample_error(self):
+        """Draws whether a single request fails"""
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def sample_corrupt(self):
+        """Draws whether a single request returns an invalid body"""
+        with self._lock:
+            return self._random.random() < self.corrupt_rate
+
+    def count_request(self):
+        """Registers a received request"""
+        with self._lock:
+            self.request_count += 1
+
+    def nearest_recording(self, latitude, longitude):
+        """Returns the recorded response closest to the requested location"""
+        _, _, body = min(self.recordings, key=lambda rec: (rec[0] - latitude) ** 2 + (rec[1] - longitude) ** 2)
+        return body
+
+    def start(self):
+        """Starts serving in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops serving and closes the socket"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    """Command line interface to record and serve PVGIS responses"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="record a TMY response from PVGIS")
+    record_parser.add_argument("--lat", type=float, required=True)
+    record_parser.add_argument("--lon", type=float, required=True)
+    record_parser.add_argument("--recordings", type=Path, default=RECORDINGS_DIR)
+
+    serve_parser = subparsers.add_parser("serve", help="serve the recorded TMY responses")
+    serve_parser.add_argument("--recordings", type=Path, default=RECORDINGS_DIR)
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--latency", type=float, default=0.0, help="mean latency per request [s]")
+    serve_parser.add_argument("--jitter", type=float, default=0.0, help="latency spread per request [s]")
+    serve_parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of failing requests [-]")
+    serve_parser.add_argument("--seed", type=int, default=None)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        print(f"Recorded {record_tmy(args.lat, args.lon, args.recordings)}")
+        return
+
+    stub = PVGISStub(args.recordings, args.latency, args.jitter, args.error_rate, args.host, args.port, args.seed)
+    print(f"Serving {len(stub.recordings)} recording(s) on {stub.url}")
+    try:
+        stub.start()
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
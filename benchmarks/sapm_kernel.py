@@ -0,0 +1,94 @@
+"""Validation and benchmark of the fused SAPM kernel against the pvlib model chain.
+
+For every recorded location and every module/inverter combination of the app, the AC power of the fused kernel is
+compared to the pvlib reference, after which both model chains are timed:
+    python -m benchmarks.sapm_kernel --repeat 20
+"""
+import argparse
+import itertools
+import time
+from pathlib import Path
+
+import numpy as np
+import pvlib
+
+import pv_calculations
+from benchmarks.pvgis_stub import RECORDINGS_DIR, PVGISStub
+from constants import inverter_name_dict, module_name_dict
+from pv_calculations import get_location_data, run_model_chain, translate_names
+from sapm_kernel import run_fused_model_chain
+from weather_client import PVGISClient
+
+RTOL = 1e-9  # [-]
+ATOL = 1e-6  # [W]
+
+
+def build_systems(latitude, area=20):
+    """Creates the systems (and number of modules) for all module/inverter combinations of the app"""
+    modules = pvlib.pvsystem.retrieve_sam("SandiaMod")
+    inverters = pvlib.pvsystem.retrieve_sam("CECInverter")
+    systems = []
+    for module_name, inverter_name in itertools.product(module_name_dict.values(), inverter_name_dict.values()):
+        module = modules[translate_names(module_name["name"])]
+        system = {
+            "module": module,
+            "inverter": inverters[translate_names(inverter_name["name"])],
+            "surface_azimuth": 180,
+            "surface_tilt": latitude,
+        }
+        systems.append((system, area // module["Area"]))
+    return systems
+
+
+def validate(location_data, systems, temperature_model_parameters):
+    """Raises an AssertionError when the fused kernel deviates from pvlib, returns the largest deviation [W]"""
+    max_deviation = 0.0
+    for system, nr_modules in systems:
+        reference = run_model_chain(location_data, system, temperature_model_parameters, nr_modules)
+        fused = run_fused_model_chain(location_data, system, temperature_model_parameters, nr_modules)
+        for expected, actual in zip(reference, fused):
+            np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), rtol=RTOL, atol=ATOL, equal_nan=True)
+            max_deviation = max(max_deviation, np.nanmax(np.abs(actual.to_numpy() - expected.to_numpy())))
+    return max_deviation
+
+
+def benchmark(model_chain, location_data, system, temperature_model_parameters, nr_modules, repeat):
+    """Returns the best time of a model chain over a number of repetitions [s]"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model_chain(location_data, system, temperature_model_parameters, nr_modules)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    """Command line interface of the validation and benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordings", type=Path, default=RECORDINGS_DIR)
+    parser.add_argument("--repeat", type=int, default=20, help="number of timed runs per model chain")
+    args = parser.parse_args()
+
+    temperature_model_parameters = pvlib.temperature.TEMPERATURE_MODEL_PARAMETERS["sapm"]["open_rack_glass_glass"]
+    with PVGISStub(args.recordings) as stub:
+        pv_calculations.pvgis_client = PVGISClient(url=stub.url)
+        for latitude, longitude, _ in stub.recordings:
+            location_data = get_location_data(latitude, longitude)
+            location_data.solar_position  # pylint: disable=pointless-statement  # exclude it from the timings
+            systems = build_systems(latitude)
+
+            max_deviation = validate(location_data, systems, temperature_model_parameters)
+            system, nr_modules = systems[0]
+            timings = [
+                benchmark(model_chain, location_data, system, temperature_model_parameters, nr_modules, args.repeat)
+                for model_chain in (run_model_chain, run_fused_model_chain)
+            ]
+            print(
+                f"({latitude}, {longitude}): {len(systems)} systems validated (max deviation {max_deviation:.2e} W), "
+                f"pvlib {timings[0] * 1000:.2f} ms, fused {timings[1] * 1000:.2f} ms "
+                f"({timings[0] / timings[1]:.1f}x faster)"
+            )
+
+
+if __name__ == "__main__":
+    main()
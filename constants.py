@@ -1,4 +1,4 @@
-"""Dictionaries describing module and inverter information are stored here"""
+"""Dictionaries describing module and inverter information and climatological data are stored here"""
 
 type_dict = {
     "California Energy Commission": "CECInverter",
@@ -61,3 +61,19 @@ inverter_name_dict = {
         "price": 220.95,
     },
 }
+# clearness factor (ratio of the yearly irradiation to the clear-sky irradiation) per latitude band, keyed by the
+# upper bound of the absolute latitude; used to scale the clear-sky estimate of the fast preview to typical weather.
+# These are coarse, hand-picked placeholders, not a calibrated climatology: they are not derived from a dataset and
+# only follow the zonal pattern of cloudiness (cloudy tropics, clear subtropics, cloudy mid and high latitudes).
+# Longitude is ignored, e.g. at 25 degrees north the Sahara and Bangladesh get the same factor, and the same factor
+# is applied to the GHI, DNI and DHI alike, while clouds reduce the DNI much more than the DHI. The estimate is only
+# shown as provisional; replace the values by e.g. monthly PVGIS or NASA POWER data if it has to be more accurate.
+clearness_factor_dict = {
+    10: 0.60,  # equatorial, frequently overcast
+    20: 0.68,
+    30: 0.75,  # subtropical deserts
+    40: 0.72,
+    50: 0.62,
+    60: 0.55,
+    90: 0.50,
+}
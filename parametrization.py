@@ -150,6 +150,12 @@ provided by the *System Advisor Model* (SAM) as developed by the
         autoselect_single_option=True,
         default="AstroPower APX-120",
     )
+    step_2.fast_preview = ToggleButton(
+        "Fast preview",
+        default=True,
+        description="Show a provisional estimate based on a clear-sky model while the weather data is retrieved."
+        "  \n Update the view to replace it by the result based on the weather data.",
+    )
 
     # Step 3 contains the calculation of the break-even point and visualisation thereof
     step_3 = Step("Step 3 Visualise your return-on-investment", views="get_plotly_view")
@@ -15,10 +15,18 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 SOFTWARE.
 """
 import datetime
+from functools import cached_property
 
 import pandas as pd
 import pvlib
 
+from constants import clearness_factor_dict
+from sapm_kernel import run_fused_model_chain
+from weather_client import PVGISClient
+
+# shared client, so connections, the cache and the circuit breaker are reused over all views
+pvgis_client = PVGISClient()
+
 
 def translate_names(entry):
     """Translates module and inverter names to suit with the SAM databases"""
@@ -30,63 +38,112 @@ def translate_names(entry):
     return translated_entry
 
 
-def get_location_data(latitude, longitude):
-    """Retrieves the weather data based on the location."""
-    weather, _, inputs, _ = pvlib.iotools.get_pvgis_tmy(latitude, longitude, map_variables=True)
-    weather.index.name = "utc_time"
-    altitude = inputs["location"]["elevation"]
-
-    # determine solar position
-    solpos = pvlib.solarposition.get_solarposition(
-        time=weather.index,
-        latitude=latitude,
-        longitude=longitude,
-        altitude=altitude,
-        temperature=weather["temp_air"],
-        pressure=weather["pressure"],
-    )
-    return {"weather": weather, "altitude": altitude, "solar_position": solpos}
-
-
-def calculate_energy_generation(
-    latitude,
-    longitude,
-    inverter_name,
-    module_name,
-    area=2,
-):
-    """Calculates the yearly energy yield as a result of the coorinates"""
-
-    # get module and inverter information from the databases
-    modules = pvlib.pvsystem.retrieve_sam("SandiaMod")
-    inverters = pvlib.pvsystem.retrieve_sam("CECInverter")
-    module = modules[translate_names(module_name)]
-    inverter = inverters[translate_names(inverter_name)]
-
-    # get module area information and calculate the amount of modules possible
-    surface_area = module["Area"]
-    nr_modules = area // surface_area
-
-    # get temperature specifications of module materials (default most used in consumer-systems)
-    temperature_model_parameters = pvlib.temperature.TEMPERATURE_MODEL_PARAMETERS["sapm"]["open_rack_glass_glass"]
-
-    # retreive weather data and elevation (altitude)
-    location_data = get_location_data(latitude, longitude)
-    weather = location_data["weather"]
+class LocationData:
+    """Weather data, altitude and solar position of a location.
+    Each is only retrieved or computed on first access and then memoized, so a view only pays for what it uses."""
+
+    def __init__(self, latitude, longitude):
+        self.latitude = latitude
+        self.longitude = longitude
+
+    @cached_property
+    def _tmy(self):
+        weather, inputs, approximate = pvgis_client.get_tmy(self.latitude, self.longitude)
+        weather.index.name = "utc_time"
+        return weather, inputs, approximate
+
+    @property
+    def provisional(self):
+        """Whether the data is an estimate, e.g. taken from a nearby location while PVGIS is unavailable"""
+        return self._tmy[2]
+
+    @cached_property
+    def weather(self):
+        """Weather data of a typical meteorological year"""
+        return self._tmy[0]
+
+    @cached_property
+    def altitude(self):
+        """Elevation of the location"""
+        return self._tmy[1]["location"]["elevation"]
+
+    @cached_property
+    def solar_position(self):
+        """Solar position for each timestamp of the weather data"""
+        return pvlib.solarposition.get_solarposition(
+            time=self.weather.index,
+            latitude=self.latitude,
+            longitude=self.longitude,
+            altitude=self.altitude,
+            temperature=self.weather["temp_air"],
+            pressure=self.weather["pressure"],
+        )
+
+
+class ClearSkyLocationData(LocationData):
+    """Estimate of the location data which needs no network access: the clear-sky irradiance scaled by the
+    coarse clearness factor of the latitude band (see constants.py), at sea level and with a constant temperature and
+    wind speed."""
+
+    provisional = True
+    temp_air = 15.0  # [degrees_C]
+    wind_speed = 2.0  # [m/s]
+
+    @cached_property
+    def _times(self):
+        # hourly timestamps of a year without leap day, like a TMY
+        return pd.date_range("2019-01-01", periods=8760, freq="1h", tz="UTC", name="utc_time")
+
+    @cached_property
+    def _tmy(self):
+        clearness_factor = next(
+            factor for max_latitude, factor in clearness_factor_dict.items() if abs(self.latitude) <= max_latitude
+        )
+        location = pvlib.location.Location(self.latitude, self.longitude)
+        weather = location.get_clearsky(self._times, solar_position=self.solar_position) * clearness_factor
+        weather["temp_air"] = self.temp_air
+        weather["wind_speed"] = self.wind_speed
+        weather["pressure"] = pvlib.atmosphere.alt2pres(0)
+        return weather, {"location": {"elevation": 0}}, True
+
+    @cached_property
+    def solar_position(self):
+        """Solar position for each timestamp, also used for the clear-sky model"""
+        return pvlib.solarposition.get_solarposition(
+            time=self._times,
+            latitude=self.latitude,
+            longitude=self.longitude,
+            altitude=0,
+            temperature=self.temp_air,
+            pressure=pvlib.atmosphere.alt2pres(0),
+        )
+
+
+def get_location_data(latitude, longitude, fast_preview=False):
+    """Retrieves the weather data based on the location, see LocationData.
+    With fast_preview, a clear-sky estimate is returned if the TMY data is not cached yet, the TMY data is then
+    fetched in the background so it can replace the estimate on the next request. If that fetch failed, the TMY data
+    is requested again instead, so the failure is shown rather than the estimate."""
+    if (
+        fast_preview
+        and not pvgis_client.is_cached(latitude, longitude)
+        and not pvgis_client.prefetch_failed(latitude, longitude)
+    ):
+        pvgis_client.prefetch(latitude, longitude)
+        return ClearSkyLocationData(latitude, longitude)
+    return LocationData(latitude, longitude)
+
+
+def run_model_chain(location_data, system, temperature_model_parameters, nr_modules):
+    """Calculates the AC power of the system and of a single module with the SAPM model chain of pvlib"""
+    module = system["module"]
+    inverter = system["inverter"]
+    weather = location_data.weather
     temp_air = weather["temp_air"]  # [degrees_C]
     wind_speed = weather["wind_speed"]  # [m/s]
     pressure = weather["pressure"]  # [Pa]
-    solpos = location_data["solar_position"]
-
-    # declare system
-    system = {
-        "module": module,
-        "inverter": inverter,
-        "surface_azimuth": 180,
-        "surface_tilt": latitude,
-    }
+    solpos = location_data.solar_position
 
-    # calculate energy produced based on entered data
     dni_extra = pvlib.irradiance.get_extra_radiation(weather.index)
     airmass = pvlib.atmosphere.get_relative_airmass(solpos["apparent_zenith"])
     am_abs = pvlib.atmosphere.get_absolute_airmass(airmass, pressure)
@@ -119,6 +176,56 @@ def calculate_energy_generation(
     ac_yield = pvlib.inverter.sandia(dc_yield["v_mp"] * nr_modules, dc_yield["p_mp"] * nr_modules, inverter)
     ac_yield_per_module = pvlib.inverter.sandia(dc_yield["v_mp"], dc_yield["p_mp"], inverter)
 
+    return ac_yield, ac_yield_per_module
+
+
+MODEL_CHAINS = {"pvlib": run_model_chain, "fused": run_fused_model_chain}
+
+
+def calculate_energy_generation(
+    latitude,
+    longitude,
+    inverter_name,
+    module_name,
+    area=2,
+    engine="pvlib",
+    location_data=None,
+):
+    """Calculates the yearly energy yield as a result of the coorinates.
+    The model chain is run by pvlib, or with engine="fused" in a single compiled pass (see sapm_kernel).
+    The location data is retrieved from PVGIS, unless given (e.g. a clear-sky estimate)."""
+
+    # get module and inverter information from the databases
+    modules = pvlib.pvsystem.retrieve_sam("SandiaMod")
+    inverters = pvlib.pvsystem.retrieve_sam("CECInverter")
+    module = modules[translate_names(module_name)]
+    inverter = inverters[translate_names(inverter_name)]
+
+    # get module area information and calculate the amount of modules possible
+    surface_area = module["Area"]
+    nr_modules = area // surface_area
+
+    # get temperature specifications of module materials (default most used in consumer-systems)
+    temperature_model_parameters = pvlib.temperature.TEMPERATURE_MODEL_PARAMETERS["sapm"]["open_rack_glass_glass"]
+
+    # retreive weather data and elevation (altitude)
+    if location_data is None:
+        location_data = get_location_data(latitude, longitude)
+
+    # declare system
+    system = {
+        "module": module,
+        "inverter": inverter,
+        "surface_azimuth": 180,
+        "surface_tilt": latitude,
+    }
+
+    # calculate energy produced based on entered data
+    if engine not in MODEL_CHAINS:
+        raise ValueError(f"Unknown engine '{engine}', choose from {list(MODEL_CHAINS)}")
+    model_chain = MODEL_CHAINS[engine]
+    ac_yield, ac_yield_per_module = model_chain(location_data, system, temperature_model_parameters, nr_modules)
+
     # output for the energy per module
     yield_per_module = ac_yield_per_module.to_frame()
     yield_per_module["utc_time"] = pd.to_datetime(yield_per_module.index)
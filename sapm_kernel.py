@@ -0,0 +1,216 @@
+"""Fused SAPM model chain, computed in a single compiled pass over the raw arrays of the weather data.
+
+Performs the same calculation as run_model_chain in pv_calculations (extraterrestrial radiation, airmass, angle of
+incidence, Hay-Davies transposition, SAPM cell temperature, effective irradiance, SAPM and Sandia inverter), with the
+formulas as implemented in pvlib 0.9.3, but without creating intermediate pandas objects. The kernel is compiled with
+numba when available, without numba it runs as plain python (with a warning), which is much slower than pvlib itself.
+The kernel is validated against pvlib in tests/test_sapm_kernel.py, see benchmarks/sapm_kernel.py for the benchmark.
+"""
+import math
+import warnings
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba is optional, without it the kernel runs as (slow) plain python
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Replaces the numba decorator by a no-op"""
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+# order in which the module and inverter parameters are passed to the kernel
+MODULE_PARAMETERS = (
+    "A0", "A1", "A2", "A3", "A4", "B0", "B1", "B2", "B3", "B4", "B5", "FD", "C0", "C1", "C2", "C3",
+    "Impo", "Vmpo", "Aimp", "Bvmpo", "Mbvmp", "N", "Cells_in_Series",
+)  # fmt: skip
+INVERTER_PARAMETERS = ("Paco", "Pdco", "Vdco", "Pso", "C0", "C1", "C2", "C3", "Pnt")
+
+SOLAR_CONSTANT = 1366.1  # [W/m2]
+ALBEDO = 0.25  # [-]
+ELEMENTARY_CHARGE = 1.60218e-19  # [C]
+BOLTZMANN_CONSTANT = 1.38066e-23  # [J/K]
+
+
+@njit(cache=True)
+def _maximum(value, lower):
+    """Maximum which propagates nan, like np.maximum"""
+    if math.isnan(value) or value >= lower:
+        return value
+    return lower
+
+
+@njit(cache=True)
+def _minimum(value, upper):
+    """Minimum which propagates nan, like np.minimum"""
+    if math.isnan(value) or value <= upper:
+        return value
+    return upper
+
+
+@njit(cache=True)
+def _sandia_inverter(v_dc, p_dc, inv):
+    """AC power of the Sandia inverter model"""
+    paco, pdco, vdco, pso = inv[0], inv[1], inv[2], inv[3]
+    c_0, c_1, c_2, c_3, pnt = inv[4], inv[5], inv[6], inv[7], inv[8]
+    a = pdco * (1 + c_1 * (v_dc - vdco))
+    b = pso * (1 + c_2 * (v_dc - vdco))
+    c = c_0 * (1 + c_3 * (v_dc - vdco))
+    power_ac = (paco / (a - b) - c * (a - b)) * (p_dc - b) + c * (p_dc - b) ** 2
+    power_ac = _minimum(power_ac, paco)
+    if p_dc < pso:
+        power_ac = -1.0 * abs(pnt)
+    return power_ac
+
+
+@njit(cache=True)
+def _sapm_kernel(
+    apparent_zenith,
+    azimuth,
+    day_of_year,
+    dni,
+    ghi,
+    dhi,
+    temp_air,
+    wind_speed,
+    pressure,
+    surface_tilt,
+    surface_azimuth,
+    nr_modules,
+    mod,
+    inv,
+    temp_a,
+    temp_b,
+    temp_delta,
+):
+    """Calculates the AC power of the system and of a single module for each timestep"""
+    size = apparent_zenith.shape[0]
+    ac_system = np.empty(size)
+    ac_module = np.empty(size)
+
+    deg2rad = math.pi / 180
+    cos_tilt = math.cos(surface_tilt * deg2rad)
+    sin_tilt = math.sin(surface_tilt * deg2rad)
+    ground_factor = ALBEDO * (1 - cos_tilt) * 0.5
+    sky_view = 0.5 * (1 + cos_tilt)
+
+    for i in range(size):
+        zenith = apparent_zenith[i]
+
+        # extraterrestrial radiation (spencer)
+        day_angle = (2.0 * math.pi / 365.0) * (day_of_year[i] - 1)
+        dni_extra = SOLAR_CONSTANT * (
+            1.00011
+            + 0.034221 * math.cos(day_angle)
+            + 0.00128 * math.sin(day_angle)
+            + 0.000719 * math.cos(2 * day_angle)
+            + 7.7e-05 * math.sin(2 * day_angle)
+        )
+
+        # absolute airmass (kastenyoung1989), nan when the sun is below the horizon
+        if zenith > 90:
+            airmass = math.nan
+        else:
+            airmass = 1.0 / (math.cos(zenith * deg2rad) + 0.50572 * ((6.07995 + (90 - zenith)) ** -1.6364))
+        airmass_absolute = airmass * pressure[i] / 101325.0
+
+        # angle of incidence
+        cos_zenith = math.cos(zenith * deg2rad)
+        projection = cos_tilt * cos_zenith + sin_tilt * math.sin(zenith * deg2rad) * math.cos(
+            (azimuth[i] - surface_azimuth) * deg2rad
+        )
+        projection = _minimum(_maximum(projection, -1.0), 1.0)
+        aoi = math.acos(projection) * (180 / math.pi)
+
+        # plane of array irradiance (haydavies)
+        ratio_beam = _maximum(projection, 0.0) / _maximum(cos_zenith, 0.01745)
+        anisotropy = dni[i] / dni_extra
+        poa_sky_diffuse = _maximum(dhi[i] * (anisotropy * ratio_beam + (1 - anisotropy) * sky_view), 0.0)
+        poa_diffuse = poa_sky_diffuse + ghi[i] * ground_factor
+        poa_direct = _maximum(dni[i] * math.cos(aoi * deg2rad), 0.0)
+        poa_global = poa_direct + poa_diffuse
+
+        # cell temperature (sapm)
+        temp_module = poa_global * math.exp(temp_a + temp_b * wind_speed[i]) + temp_air[i]
+        temp_cell = temp_module + (poa_global / 1000.0) * temp_delta
+
+        # effective irradiance, spectral loss and incidence angle modifier are polynomials evaluated as np.polyval
+        spectral_loss = 0.0
+        for j in range(4, -1, -1):
+            spectral_loss = spectral_loss * airmass_absolute + mod[j]
+        if math.isnan(spectral_loss):
+            spectral_loss = 0.0
+        spectral_loss = _maximum(spectral_loss, 0.0)
+        iam = 0.0
+        for j in range(10, 4, -1):
+            iam = iam * aoi + mod[j]
+        iam = _maximum(iam, 0.0)
+        if aoi < 0:
+            iam = 0.0
+        effective_irradiance = spectral_loss * (poa_direct * iam + mod[11] * poa_diffuse) / 1000
+
+        # maximum power point (sapm)
+        if effective_irradiance > 0:
+            log_irradiance = math.log(effective_irradiance)
+        elif effective_irradiance == 0:
+            log_irradiance = -math.inf
+        else:
+            log_irradiance = math.nan
+        delta = mod[21] * BOLTZMANN_CONSTANT * (temp_cell + 273.15) / ELEMENTARY_CHARGE
+        bvmpo = mod[19] + mod[20] * (1 - effective_irradiance)
+        i_mp = (
+            mod[16]
+            * (mod[12] * effective_irradiance + mod[13] * effective_irradiance**2)
+            * (1 + mod[18] * (temp_cell - 25))
+        )
+        v_mp = _maximum(
+            mod[17]
+            + mod[14] * mod[22] * delta * log_irradiance
+            + mod[15] * mod[22] * ((delta * log_irradiance) ** 2)
+            + bvmpo * (temp_cell - 25),
+            0.0,
+        )
+        p_mp = i_mp * v_mp
+
+        ac_system[i] = _sandia_inverter(v_mp * nr_modules, p_mp * nr_modules, inv)
+        ac_module[i] = _sandia_inverter(v_mp, p_mp, inv)
+
+    return ac_system, ac_module
+
+
+def run_fused_model_chain(location_data, system, temperature_model_parameters, nr_modules):
+    """Calculates the AC power of the system and of a single module with the fused SAPM kernel"""
+    if not NUMBA_AVAILABLE:
+        warnings.warn(
+            "numba is not installed, the fused SAPM kernel runs as plain python, which is much slower than pvlib",
+            RuntimeWarning,
+        )
+    weather = location_data.weather
+    solpos = location_data.solar_position
+    ac_system, ac_module = _sapm_kernel(
+        solpos["apparent_zenith"].to_numpy(dtype=np.float64),
+        solpos["azimuth"].to_numpy(dtype=np.float64),
+        weather.index.dayofyear.to_numpy(dtype=np.float64),
+        weather["dni"].to_numpy(dtype=np.float64),
+        weather["ghi"].to_numpy(dtype=np.float64),
+        weather["dhi"].to_numpy(dtype=np.float64),
+        weather["temp_air"].to_numpy(dtype=np.float64),
+        weather["wind_speed"].to_numpy(dtype=np.float64),
+        weather["pressure"].to_numpy(dtype=np.float64),
+        float(system["surface_tilt"]),
+        float(system["surface_azimuth"]),
+        float(nr_modules),
+        np.array([system["module"][name] for name in MODULE_PARAMETERS], dtype=np.float64),
+        np.array([system["inverter"][name] for name in INVERTER_PARAMETERS], dtype=np.float64),
+        float(temperature_model_parameters["a"]),
+        float(temperature_model_parameters["b"]),
+        float(temperature_model_parameters["deltaT"]),
+    )
+    return pd.Series(ac_system, index=weather.index), pd.Series(ac_module, index=weather.index)
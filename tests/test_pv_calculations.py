@@ -0,0 +1,136 @@
+"""Tests of the weather data used by the calculations, with PVGIS replaced by the local stand-in server"""
+import threading
+import time
+from concurrent.futures import Future
+from unittest import mock
+
+import pvlib
+from munch import Munch
+from viktor.errors import UserError
+from viktor.geometry import GeoPoint
+
+import pv_calculations
+from app import Controller
+from benchmarks.load_test import get_view
+from pv_calculations import ClearSkyLocationData, get_location_data
+from tests.helpers import StubTestCase
+from weather_client import CircuitBreaker, PVGISClient
+
+
+class ImmediateExecutor:
+    """Executor which runs a submitted function right away, so the returned future is already done"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def submit(self, func, *args):
+        """Runs the function and returns its outcome as finished future"""
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as exc:  # pylint: disable=broad-except
+            future.set_exception(exc)
+        return future
+
+
+class ClientTestCase(StubTestCase):
+    """Replaces the PVGIS client of the calculations by a client of the stand-in server for every test"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = PVGISClient(url=self.stub.url, max_retries=0, backoff_factor=0.001)
+        self.addCleanup(setattr, pv_calculations, "pvgis_client", pv_calculations.pvgis_client)
+        pv_calculations.pvgis_client = self.client
+
+
+class TestLocationData(ClientTestCase):
+    """Tests that the location data is only retrieved or computed when used"""
+
+    def test_weather_without_solar_position(self):
+        """The weather data, the altitude and the weather view do not compute the solar position"""
+        with mock.patch("pvlib.solarposition.get_solarposition", side_effect=AssertionError("solar position")):
+            location_data = get_location_data(51.9, 4.5)
+            self.assertEqual(len(location_data.weather), 24)
+            self.assertEqual(location_data.altitude, 10.0)
+            params = Munch(step_1=Munch(point=GeoPoint(51.9, 4.5)))
+            get_view(Controller(), "get_weather_data")(params=params)
+
+    def test_computed_once(self):
+        """Each property is computed only once, also when accessed repeatedly"""
+        location_data = get_location_data(51.9, 4.5)
+        with mock.patch(
+            "pvlib.solarposition.get_solarposition", wraps=pvlib.solarposition.get_solarposition
+        ) as get_solarposition:
+            for _ in range(3):
+                self.assertIs(location_data.solar_position, location_data.solar_position)
+                self.assertIs(location_data.weather, location_data.weather)
+                location_data.altitude  # pylint: disable=pointless-statement
+        get_solarposition.assert_called_once()
+        self.assertEqual(self.stub.request_count, 1)
+
+
+class TestFastPreview(ClientTestCase):
+    """Tests the provisional clear-sky estimate which is shown while the TMY data is fetched"""
+
+    def wait_for_prefetch(self, latitude, longitude, timeout=5):
+        """Waits until the background fetch of a location has ended"""
+        deadline = time.monotonic() + timeout
+        while self.client.is_prefetching(latitude, longitude):
+            if time.monotonic() > deadline:
+                self.fail(f"prefetch of ({latitude}, {longitude}) did not end within {timeout} s")
+            time.sleep(0.01)
+
+    def test_estimate_replaced_by_tmy(self):
+        """The estimate is shown until the prefetched TMY data is available"""
+        location_data = get_location_data(51.9, 4.5, fast_preview=True)
+        self.assertIsInstance(location_data, ClearSkyLocationData)
+        self.assertTrue(location_data.provisional)
+        self.wait_for_prefetch(51.9, 4.5)
+
+        location_data = get_location_data(51.9, 4.5, fast_preview=True)
+        self.assertNotIsInstance(location_data, ClearSkyLocationData)
+        self.assertFalse(location_data.provisional)
+        self.assertEqual(len(location_data.weather), 24)
+        self.assertEqual(self.stub.request_count, 1)
+
+    def test_failed_prefetch_raises(self):
+        """A failed prefetch is shown as user error on the next request, instead of the estimate"""
+        self.stub.error_rate = 1.0
+        self.assertTrue(get_location_data(51.9, 4.5, fast_preview=True).provisional)
+        self.wait_for_prefetch(51.9, 4.5)
+
+        with self.assertRaises(UserError):
+            get_location_data(51.9, 4.5, fast_preview=True).weather  # pylint: disable=pointless-statement
+        self.assertEqual(self.stub.request_count, 2)
+
+        self.stub.error_rate = 0.0
+        location_data = get_location_data(51.9, 4.5, fast_preview=True)
+        self.assertFalse(location_data.provisional)
+        self.assertFalse(self.client.prefetch_failed(51.9, 4.5))
+
+    def test_prefetch_with_open_breaker(self):
+        """A prefetch which has ended before it is registered, e.g. because the circuit breaker is open, does not
+        block the client"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        # the fetch fails without any request, so the prefetch may already be done when submit returns
+        with mock.patch("weather_client.ThreadPoolExecutor", ImmediateExecutor):
+            pv_calculations.pvgis_client = PVGISClient(url=self.stub.url, circuit_breaker=breaker)
+
+        results = []
+
+        def preview():
+            """Requests the preview twice, the second time the failed prefetch is raised"""
+            results.append(get_location_data(10.0, 5.0, fast_preview=True).provisional)
+            try:
+                get_location_data(10.0, 5.0, fast_preview=True).weather  # pylint: disable=pointless-statement
+            except UserError as exc:
+                results.append(exc)
+
+        thread = threading.Thread(target=preview, daemon=True)
+        thread.start()
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive(), "fast preview blocked after a prefetch with an open circuit breaker")
+        self.assertTrue(results[0])
+        self.assertIsInstance(results[1], UserError)
+        self.assertEqual(self.stub.request_count, 0)
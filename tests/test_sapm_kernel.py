@@ -0,0 +1,43 @@
+"""Validation of the fused SAPM kernel against the pvlib model chain, offline on the clear-sky estimate"""
+import unittest
+from unittest import mock
+
+import numpy as np
+import pvlib
+
+import sapm_kernel
+from benchmarks.sapm_kernel import ATOL, RTOL, build_systems
+from pv_calculations import ClearSkyLocationData, run_model_chain
+from sapm_kernel import run_fused_model_chain
+
+LOCATIONS = ((51.92, 4.47), (-33.9, 18.4), (64.1, -21.9))
+
+
+class TestFusedModelChain(unittest.TestCase):
+    """Tests the fused SAPM kernel"""
+
+    def setUp(self):
+        self.temperature_model_parameters = pvlib.temperature.TEMPERATURE_MODEL_PARAMETERS["sapm"][
+            "open_rack_glass_glass"
+        ]
+
+    def test_matches_pvlib(self):
+        """The AC power equals the pvlib model chain for all module/inverter combinations of the app"""
+        for latitude, longitude in LOCATIONS:
+            location_data = ClearSkyLocationData(latitude, longitude)
+            for system, nr_modules in build_systems(latitude):
+                with self.subTest(location=(latitude, longitude), module=system["module"].name):
+                    reference = run_model_chain(location_data, system, self.temperature_model_parameters, nr_modules)
+                    fused = run_fused_model_chain(location_data, system, self.temperature_model_parameters, nr_modules)
+                    for expected, actual in zip(reference, fused):
+                        np.testing.assert_allclose(
+                            actual.to_numpy(), expected.to_numpy(), rtol=RTOL, atol=ATOL, equal_nan=True
+                        )
+
+    def test_warns_without_numba(self):
+        """Without numba a warning is given that the kernel runs as plain python"""
+        location_data = ClearSkyLocationData(51.92, 4.47)
+        system, nr_modules = build_systems(51.92)[0]
+        with mock.patch.object(sapm_kernel, "NUMBA_AVAILABLE", False):
+            with self.assertWarnsRegex(RuntimeWarning, "numba is not installed"):
+                run_fused_model_chain(location_data, system, self.temperature_model_parameters, nr_modules)
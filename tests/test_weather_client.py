@@ -0,0 +1,175 @@
+"""Tests of the PVGIS client against the local PVGIS stand-in server"""
+import time
+
+from benchmarks.pvgis_stub import load_recordings
+from tests.helpers import StubTestCase, write_recording
+from weather_client import CircuitBreaker, InvalidLocationError, PVGISClient, WeatherServiceUnavailable
+
+
+class TestRetries(StubTestCase):
+    """Tests the retries of the PVGIS client"""
+
+    def test_retry_server_error(self):
+        """Server errors are retried up to max_retries times"""
+        self.stub.error_rate = 1.0
+        client = PVGISClient(url=self.stub.url, max_retries=2, backoff_factor=0.001)
+        with self.assertRaises(WeatherServiceUnavailable):
+            client.get_tmy(51.9, 4.5)
+        self.assertEqual(self.stub.request_count, 3)
+
+    def test_retry_too_many_requests(self):
+        """Rate limiting (HTTP 429) is retried like a server error"""
+        self.stub.error_rate, self.stub.error_status = 1.0, 429
+        client = PVGISClient(url=self.stub.url, max_retries=2, backoff_factor=0.001)
+        with self.assertRaises(WeatherServiceUnavailable):
+            client.get_tmy(51.9, 4.5)
+        self.assertEqual(self.stub.request_count, 3)
+
+    def test_no_retry_client_error(self):
+        """Client errors (e.g. a location at sea) are raised immediately as user error, without opening the breaker"""
+        self.stub.error_rate, self.stub.error_status = 1.0, 400
+        breaker = CircuitBreaker(failure_threshold=1)
+        client = PVGISClient(url=self.stub.url, max_retries=2, circuit_breaker=breaker)
+        with self.assertRaisesRegex(InvalidLocationError, "Location over the sea"):
+            client.get_tmy(51.9, 4.5)
+        self.assertEqual(self.stub.request_count, 1)
+        self.assertEqual(breaker.state, "closed")
+
+    def test_single_timeout(self):
+        """A single timeout is used for both connecting and reading, like in requests"""
+        self.stub.latency = 0.3
+        client = PVGISClient(url=self.stub.url, timeout=0.1, max_retries=0)
+        self.assertEqual(client.timeout, (0.1, 0.1))
+        with self.assertRaises(WeatherServiceUnavailable):
+            client.get_tmy(51.9, 4.5)
+
+    def test_deadline_limits_all_attempts(self):
+        """Slow responses are retried only as long as the overall deadline allows"""
+        self.stub.latency = 0.3
+        client = PVGISClient(url=self.stub.url, timeout=(1, 0.1), max_retries=10, backoff_factor=0.01, deadline=0.5)
+        start = time.monotonic()
+        with self.assertRaises(WeatherServiceUnavailable):
+            client.get_tmy(51.9, 4.5)
+        self.assertLess(time.monotonic() - start, 0.8)
+        self.assertLess(self.stub.request_count, 10)
+
+
+class TestCircuitBreaker(StubTestCase):
+    """Tests the circuit breaker of the PVGIS client"""
+
+    def test_open_half_open_close(self):
+        """The breaker opens after consecutive failures, fails fast while open and closes after a successful trial"""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        client = PVGISClient(url=self.stub.url, max_retries=0, circuit_breaker=breaker)
+        self.stub.error_rate = 1.0
+        for _ in range(2):
+            with self.assertRaises(WeatherServiceUnavailable):
+                client.get_tmy(51.9, 4.5)
+        self.assertEqual(breaker.state, "open")
+
+        with self.assertRaises(WeatherServiceUnavailable):
+            client.get_tmy(51.9, 4.5)
+        self.assertEqual(self.stub.request_count, 2)
+
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, "half-open")
+        self.stub.error_rate = 0.0
+        client.get_tmy(51.9, 4.5)
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(self.stub.request_count, 3)
+
+    def test_invalid_response_during_trial_ends_trial(self):
+        """An invalid body during the half-open trial re-opens the breaker instead of blocking all later trials"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        client = PVGISClient(url=self.stub.url, max_retries=0, circuit_breaker=breaker)
+        self.stub.error_rate = 1.0
+        with self.assertRaises(WeatherServiceUnavailable):
+            client.get_tmy(51.9, 4.5)
+        self.assertEqual(breaker.state, "open")
+
+        time.sleep(0.06)
+        self.stub.error_rate, self.stub.corrupt_rate = 0.0, 1.0
+        with self.assertRaises(WeatherServiceUnavailable):
+            client.get_tmy(51.9, 4.5)
+        self.assertEqual(breaker.state, "open")
+
+        time.sleep(0.06)
+        self.stub.corrupt_rate = 0.0
+        weather, _, _ = client.get_tmy(51.9, 4.5)
+        self.assertEqual(len(weather), 24)
+        self.assertEqual(breaker.state, "closed")
+
+
+class TestCache(StubTestCase):
+    """Tests the cache and the fallback to cached data of the PVGIS client"""
+
+    def test_cache_hit(self):
+        """A location is requested only once, and changes to the returned data do not affect the cache"""
+        client = PVGISClient(url=self.stub.url)
+        weather, _, _ = client.get_tmy(51.9, 4.5)
+        weather["ghi"] = 0.0
+        weather, _, approximate = client.get_tmy(51.90001, 4.50001)
+        self.assertEqual(self.stub.request_count, 1)
+        self.assertFalse(approximate)
+        self.assertTrue((weather["ghi"] == 100.0).all())
+
+    def test_nearest_location_fallback(self):
+        """When PVGIS is unavailable, the nearest cached location within fallback_distance is marked approximate"""
+        client = PVGISClient(url=self.stub.url, max_retries=0, fallback_distance=0.5)
+        client.get_tmy(51.9, 4.5)
+        self.stub.error_rate = 1.0
+        weather, inputs, approximate = client.get_tmy(52.0, 4.6)
+        self.assertTrue(approximate)
+        self.assertEqual(len(weather), 24)
+        self.assertEqual(inputs["location"]["latitude"], 51.9)
+        self.assertFalse(client.is_cached(52.0, 4.6))
+        with self.assertRaises(WeatherServiceUnavailable):
+            client.get_tmy(53.0, 4.5)
+
+
+class TestPrefetch(StubTestCase):
+    """Tests the background prefetching of the PVGIS client"""
+
+    def test_prefetch_deduplication(self):
+        """Repeated prefetches and a request during a prefetch share a single request to PVGIS"""
+        self.stub.latency = 0.2
+        client = PVGISClient(url=self.stub.url)
+        client.prefetch(51.9, 4.5)
+        client.prefetch(51.9, 4.5)
+        weather, _, approximate = client.get_tmy(51.9, 4.5)
+        self.assertEqual(len(weather), 24)
+        self.assertFalse(approximate)
+        self.assertEqual(self.stub.request_count, 1)
+        client.prefetch(51.9, 4.5)
+        self.assertEqual(self.stub.request_count, 1)
+
+
+class TestBulk(StubTestCase):
+    """Tests fetching many locations with the PVGIS client"""
+
+    def test_bulk_in_order(self):
+        """The results are returned in the order of the coordinates"""
+        coordinates = [(51.9, 4.5), (45.5, -73.6), (-33.9, 18.4), (35.7, 139.7)]
+        for elevation, (latitude, longitude) in enumerate(coordinates[1:], start=1):
+            write_recording(self.recordings_dir, latitude, longitude, elevation=elevation * 100.0)
+        self.stub.recordings = load_recordings(self.recordings_dir)
+        self.stub.latency, self.stub.jitter = 0.05, 0.05  # let the responses arrive out of order
+
+        client = PVGISClient(url=self.stub.url)
+        results = client.get_tmy_bulk(coordinates, max_workers=4)
+        self.assertEqual(self.stub.request_count, 4)
+        for (latitude, longitude), (_, inputs, _) in zip(coordinates, results):
+            self.assertEqual((inputs["location"]["latitude"], inputs["location"]["longitude"]), (latitude, longitude))
+        self.assertEqual([inputs["location"]["elevation"] for _, inputs, _ in results], [10.0, 100.0, 200.0, 300.0])
+
+    def test_bulk_return_exceptions(self):
+        """With return_exceptions a failed location results in its exception, otherwise the exception is raised"""
+        client = PVGISClient(url=self.stub.url, max_retries=0, fallback_distance=0.0)
+        client.get_tmy(51.9, 4.5)
+        self.stub.error_rate = 1.0
+        coordinates = [(51.9, 4.5), (40.0, 4.5)]
+        results = client.get_tmy_bulk(coordinates, return_exceptions=True)
+        self.assertEqual(len(results[0][0]), 24)
+        self.assertIsInstance(results[1], WeatherServiceUnavailable)
+        with self.assertRaises(WeatherServiceUnavailable):
+            client.get_tmy_bulk(coordinates)
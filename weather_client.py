@@ -0,0 +1,301 @@
+"""Client for the PVGIS API with connection pooling, retries, circuit breaking and a cache of retrieved TMY data"""
+import io
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pvlib
+import requests
+from requests.adapters import HTTPAdapter
+from viktor.errors import UserError
+
+# base url of the PVGIS API, can be pointed to a local stand-in server (e.g. for load testing)
+PVGIS_URL = os.environ.get("PVGIS_URL", pvlib.iotools.pvgis.URL)
+
+logger = logging.getLogger(__name__)
+
+
+class WeatherServiceUnavailable(UserError):
+    """Raised when PVGIS can not be reached and no cached or approximate data is available"""
+
+
+class InvalidLocationError(UserError):
+    """Raised when PVGIS rejects the requested location, e.g. a location at sea"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing service for a while after a number of consecutive failures.
+
+    The breaker is 'closed' while the service is healthy. After `failure_threshold` consecutive failures it opens and
+    rejects all calls, until `reset_timeout` seconds have passed. Then a single trial call is let through
+    ('half-open'), which closes the breaker again on success or re-opens it on failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """Current state of the breaker: 'closed', 'open' or 'half-open'"""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow_request(self):
+        """Whether a call to the service may be made"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        """Registers a successful call"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        """Registers a failed call"""
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class PVGISClient:
+    """Retrieves TMY data from PVGIS.
+
+    All requests share a pooled HTTP session. Connection errors, timeouts and server errors (HTTP 429 and 5xx) are
+    retried with exponential backoff, other HTTP errors (e.g. a location at sea) are raised immediately. All attempts
+    together are limited to `deadline` seconds, like the single request of pvlib.iotools.get_pvgis_tmy. When PVGIS
+    keeps failing, the circuit breaker makes the client fail fast: data is then served from the cache of retrieved
+    locations, or approximated by the nearest cached location within `fallback_distance` degrees. Locations can be
+    prefetched in the background, e.g. while a provisional result is shown.
+    """
+
+    def __init__(
+        self,
+        url=PVGIS_URL,
+        timeout=(3.05, 10),
+        max_retries=2,
+        deadline=30.0,
+        backoff_factor=0.5,
+        max_backoff=8.0,
+        pool_size=10,
+        circuit_breaker=None,
+        cache_size=128,
+        fallback_distance=1.0,
+        prefetch_workers=2,
+    ):
+        self.url = url
+        # (connect, read) timeout of a single attempt [s], a single number is used for both like in requests
+        self.timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.cache_size = cache_size
+        self.fallback_distance = fallback_distance
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._prefetches = {}
+        self._failed_prefetches = set()
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix="pvgis-prefetch")
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @staticmethod
+    def _cache_key(latitude, longitude):
+        # PVGIS data has a resolution of several kilometers, so ~10 m differences can share a result
+        return round(latitude, 4), round(longitude, 4)
+
+    def _from_cache(self, latitude, longitude):
+        key = self._cache_key(latitude, longitude)
+        with self._cache_lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+    def _to_cache(self, latitude, longitude, data):
+        with self._cache_lock:
+            self._cache[self._cache_key(latitude, longitude)] = data
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        with self._prefetch_lock:
+            self._failed_prefetches.discard(self._cache_key(latitude, longitude))
+
+    def _nearest_cached(self, latitude, longitude):
+        with self._cache_lock:
+            candidates = [
+                (max(abs(lat - latitude), abs(lon - longitude)), data) for (lat, lon), data in self._cache.items()
+            ]
+        candidates = [candidate for candidate in candidates if candidate[0] <= self.fallback_distance]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda candidate: candidate[0])[1]
+
+    def _backoff_delay(self, attempt):
+        """Delay before the next attempt, exponentially increasing with 'full jitter' to spread out retries"""
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2**attempt))
+
+    def _request(self, latitude, longitude):
+        """Performs the request to PVGIS including retries and returns the parsed weather and inputs"""
+        params = {"lat": latitude, "lon": longitude, "outputformat": "json"}
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            # no attempt may last beyond the overall deadline
+            remaining = self.deadline - (time.monotonic() - start)
+            timeout = (min(self.timeout[0], remaining), min(self.timeout[1], remaining))
+            try:
+                res = self.session.get(self.url + "tmy", params=params, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                error = exc
+            else:
+                if res.ok:
+                    try:
+                        weather, _, inputs, _ = pvlib.iotools.read_pvgis_tmy(
+                            io.StringIO(res.text), pvgis_format="json", map_variables=True
+                        )
+                    except (ValueError, KeyError, TypeError) as exc:
+                        raise requests.RequestException(f"Invalid response from PVGIS: {exc!r}", response=res) from exc
+                    return weather, inputs
+                if res.status_code != 429 and res.status_code < 500:
+                    # PVGIS returns well formatted error messages for bad requests (same handling as pvlib)
+                    try:
+                        message = res.json()["message"]
+                    except (ValueError, KeyError):
+                        res.raise_for_status()
+                    raise requests.HTTPError(message, response=res)
+                try:
+                    res.raise_for_status()
+                except requests.HTTPError as exc:
+                    error = exc
+
+            delay = self._backoff_delay(attempt)
+            if attempt == self.max_retries or time.monotonic() - start + delay >= self.deadline:
+                raise error
+            time.sleep(delay)
+            attempt += 1
+
+    def _fetch(self, latitude, longitude):
+        """Requests the TMY data from PVGIS, or falls back to cached data when PVGIS is unavailable.
+        Returns the weather data, the inputs and whether the data is approximated by a nearby location."""
+        error = None
+        if self.circuit_breaker.allow_request():
+            try:
+                weather, inputs = self._request(latitude, longitude)
+            except requests.HTTPError as exc:
+                if exc.response is not None and exc.response.status_code != 429 and exc.response.status_code < 500:
+                    self.circuit_breaker.record_success()  # PVGIS is up, the request itself is invalid
+                    raise InvalidLocationError(f"No weather data available for this location ({exc}).") from exc
+                self.circuit_breaker.record_failure()
+                error = exc
+            except requests.RequestException as exc:
+                self.circuit_breaker.record_failure()
+                error = exc
+            except BaseException:
+                # any other error still ends the call, otherwise a half-open breaker never allows a trial again
+                self.circuit_breaker.record_failure()
+                raise
+            else:
+                self.circuit_breaker.record_success()
+                self._to_cache(latitude, longitude, (weather, inputs))
+                return weather, inputs, False
+
+        reason = error or "circuit breaker is open"
+        approximate = self._nearest_cached(latitude, longitude)
+        if approximate is not None:
+            logger.warning("PVGIS unavailable, using weather data of the nearest cached location (%s)", reason)
+            return approximate[0], approximate[1], True
+        logger.warning("PVGIS unavailable and no cached weather data nearby (%s)", reason)
+        raise WeatherServiceUnavailable("The weather service PVGIS is currently unavailable, please try again later.")
+
+    def get_tmy(self, latitude, longitude):
+        """Returns the TMY weather data and the PVGIS inputs (location, elevation, etc.) for a location, and whether
+        the data is approximated by the nearest cached location because PVGIS is unavailable"""
+        cached = self._from_cache(latitude, longitude)
+        if cached is not None:
+            weather, inputs, approximate = *cached, False
+        else:
+            prefetch = self._prefetches.get(self._cache_key(latitude, longitude))
+            # wait for a running prefetch of this location instead of requesting it a second time
+            data = prefetch.result() if prefetch is not None else self._fetch(latitude, longitude)
+            weather, inputs, approximate = data
+        return weather.copy(), inputs, approximate
+
+    def is_cached(self, latitude, longitude):
+        """Whether the TMY data of a location is available without a request to PVGIS"""
+        return self._from_cache(latitude, longitude) is not None
+
+    def prefetch(self, latitude, longitude):
+        """Starts fetching the TMY data of a location in the background, so it is cached once it is needed"""
+        key = self._cache_key(latitude, longitude)
+        with self._prefetch_lock:
+            if key in self._prefetches or self.is_cached(latitude, longitude):
+                return
+            future = self._prefetch_executor.submit(self._fetch, latitude, longitude)
+            self._prefetches[key] = future
+        # a finished future runs the callback right away in this thread, which takes the lock again
+        future.add_done_callback(lambda future: self._prefetch_done(key, future))
+
+    def _prefetch_done(self, key, future):
+        """Ends a prefetch and remembers whether it failed"""
+        with self._prefetch_lock:
+            self._prefetches.pop(key, None)
+            # an approximated result is not cached either, so it must be requested again just like a failure
+            if future.exception() is not None or future.result()[2]:
+                self._failed_prefetches.add(key)
+
+    def is_prefetching(self, latitude, longitude):
+        """Whether the TMY data of a location is being fetched in the background"""
+        with self._prefetch_lock:
+            return self._cache_key(latitude, longitude) in self._prefetches
+
+    def prefetch_failed(self, latitude, longitude):
+        """Whether the last prefetch of a location did not retrieve its data from PVGIS, the failure is then only
+        raised (or the data approximated) when the location is requested with get_tmy"""
+        with self._prefetch_lock:
+            return self._cache_key(latitude, longitude) in self._failed_prefetches
+
+    def get_tmy_bulk(self, coordinates, max_workers=4, return_exceptions=False):
+        """Returns the TMY data for many (latitude, longitude) pairs, fetching at most `max_workers` concurrently.
+
+        The results are in the order of `coordinates`. With `return_exceptions` failed locations result in the
+        raised exception instead of aborting the whole fetch.
+        """
+
+        def fetch(coordinate):
+            """Fetches a single location, returning instead of raising the exception if requested"""
+            try:
+                return self.get_tmy(*coordinate)
+            except Exception as exc:  # pylint: disable=broad-except
+                if return_exceptions:
+                    return exc
+                raise
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(fetch, coordinates))